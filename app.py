@@ -3,8 +3,9 @@ import pandas as pd
 import plotly.express as px
 import joblib
 import numpy as np
-from PIL import Image
 import os
+import warnings
+import pyarrow.parquet as pq
 
 # I am setting the page config to wide mode for better visualization
 st.set_page_config(page_title="Checkmate with Data", layout="wide", page_icon="♟️")
@@ -15,14 +16,83 @@ def load_resources():
     # I'm loading the model and column list once to save time
     model = joblib.load('models/chess_model.pkl')
     model_columns = joblib.load('models/model_columns.pkl')
-    return model, model_columns
+    # I also derive the opening choices and map each column name to its
+    # position here, so none of this is redone when a slider moves
+    openings = tuple(c[len('open_'):] for c in model_columns if c.startswith('open_'))
+    col_idx = {c: i for i, c in enumerate(model_columns)}
+    return model, model_columns, openings, col_idx
+
+@st.cache_data
+def predict_win_probability(material, mobility, king_moved, is_white, opening_choice):
+    # I build the single input row as a NumPy array instead of a DataFrame,
+    # and cache the result so revisiting a slider position is free
+    model, model_columns, _, col_idx = load_resources()
+    x = np.zeros((1, len(model_columns)), dtype=np.float32)
+
+    x[0, col_idx['material_diff']] = material
+    x[0, col_idx['mobility_count']] = mobility
+    x[0, col_idx['king_moved']] = int(king_moved)
+    x[0, col_idx['is_white']] = int(is_white)
+
+    if opening_choice != 'Other':
+        i = col_idx.get(f"open_{opening_choice}")
+        if i is not None:
+            x[0, i] = 1
+
+    # The model was fitted on a DataFrame, so sklearn warns that a plain array
+    # has no feature names. x follows model_columns (the training column
+    # order), so the warning is noise here.
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message='X does not have valid feature names')
+        return model.predict_proba(x)[0, 1] # Probability of Class 1 (Win)
+
+# The story section only needs the opening names (for the sunburst), so I
+# don't load the other columns, especially not the (huge) PGN text
+STORY_COLUMNS = ['opening']
 
 @st.cache_data
 def load_data():
     # Loading the raw games for the story section
-    df = pd.read_csv('data/chess_games_raw.csv')
+    # I prefer the Parquet file, but fall back to the older CSV export
+    if os.path.exists('data/chess_games_raw.parquet'):
+        df = pd.read_parquet('data/chess_games_raw.parquet', columns=STORY_COLUMNS)
+    else:
+        df = pd.read_csv('data/chess_games_raw.csv', usecols=STORY_COLUMNS)
     return df
 
+@st.cache_data
+def load_data_sample(n=5):
+    # A few complete rows (PGN included) for the raw data preview,
+    # without reading the whole file
+    if os.path.exists('data/chess_games_raw.parquet'):
+        first_batch = next(pq.ParquetFile('data/chess_games_raw.parquet').iter_batches(batch_size=n))
+        return first_batch.to_pandas()
+    return pd.read_csv('data/chess_games_raw.csv', nrows=n)
+
+@st.cache_data
+def build_sunburst_df(df):
+    # Simple hierarchy extraction logic, done with vectorized string ops.
+    # The collection script builds opening names from the chess.com URL
+    # (dashes turned into spaces), so they never contain a colon: the first
+    # word is the family and the rest is the variation.
+    parts = df['opening'].astype(str).str.partition(' ')
+    family = parts[0]
+    variation = parts[2].where(parts[1] != '', 'Main Line')
+    out = df.assign(Family=family, Variation=variation)
+
+    # Filter for top openings to keep chart readable
+    top_openings = out['Family'].value_counts().nlargest(15).index
+    return out[out['Family'].isin(top_openings)]
+
+@st.cache_data
+def build_sunburst_figure(df_sunburst):
+    return px.sunburst(
+        df_sunburst, 
+        path=['Family', 'Variation'], 
+        title="My Most Frequent Openings (Interactive)",
+        width=800, height=800
+    )
+
 # --- PAGE STRUCTURE ---
 page = st.sidebar.radio("Navigate", ["Project Story & Insights", "Win Predictor"])
 
@@ -37,19 +107,20 @@ if page == "Project Story & Insights":
     # 1. Rating Trend
     st.header("1. The Climb 📈")
     st.write("First, let's look at my rating over time. Did I actually get better?")
+    # I pass file paths (not PIL images): PNGs that already fit the page width
+    # (see scripts/03_convert_images.py) are sent as they are, instead of being
+    # decoded and re-encoded on every rerun
     try:
-        image = Image.open('images/viz_1_5_rating_trend.png')
-        st.image(image, caption='My Rating Evolution', use_container_width=True)
-    except FileNotFoundError:
+        st.image('images/viz_1_5_rating_trend.png', caption='My Rating Evolution', use_container_width=True)
+    except Exception:
         st.error("Image not found: images/viz_1_5_rating_trend.png")
 
     # 2. Habits (When do I play?)
     st.header("2. Playing Habits 🕰️")
     st.write("Does playing late at night hurt my performance? Here is a heatmap of my games by Day and Hour.")
     try:
-        img_habits = Image.open('images/viz_5_5_habits.png')
-        st.image(img_habits, use_container_width=True)
-    except FileNotFoundError:
+        st.image('images/viz_5_5_habits.png', use_container_width=True)
+    except Exception:
         st.write("Habits chart missing.")
 
     # 3. Interactive Sunburst (The "Wow" Factor)
@@ -58,26 +129,9 @@ if page == "Project Story & Insights":
     
     df = load_data()
     
-    # Simple hierarchy extraction logic
-    def extract_hierarchy(opening_str):
-        parts = opening_str.split(':') # Most PGNs use colon sep
-        if len(parts) > 1:
-            return parts[0].strip(), parts[1].strip()
-        parts = opening_str.split(' ') # Fallback
-        return parts[0], " ".join(parts[1:]) if len(parts) > 1 else "Main Line"
-
-    df[['Family', 'Variation']] = df['opening'].apply(lambda x: pd.Series(extract_hierarchy(str(x))))
-    
-    # Filter for top openings to keep chart readable
-    top_openings = df['Family'].value_counts().nlargest(15).index
-    df_sunburst = df[df['Family'].isin(top_openings)]
-    
-    fig = px.sunburst(
-        df_sunburst, 
-        path=['Family', 'Variation'], 
-        title="My Most Frequent Openings (Interactive)",
-        width=800, height=800
-    )
+    # The hierarchy and the figure are cached, so reruns don't rebuild them
+    df_sunburst = build_sunburst_df(df)
+    fig = build_sunburst_figure(df_sunburst)
     st.plotly_chart(fig, use_container_width=True)
 
     # 4. Key Insights (Merged Hypothesis Section)
@@ -90,8 +144,7 @@ if page == "Project Story & Insights":
         st.subheader("Insight A: The White Advantage")
         st.write("Playing White gives a statistically significant advantage due to the first-move initiative.")
         try:
-            img_hyp1 = Image.open('images/viz_3_5_color.png')
-            st.image(img_hyp1, caption='Win Rate by Color', use_container_width=True)
+            st.image('images/viz_3_5_color.png', caption='Win Rate by Color', use_container_width=True)
         except:
             st.error("Missing Color chart")
 
@@ -100,15 +153,14 @@ if page == "Project Story & Insights":
         st.write("Longer games favor my opponents. Shorter games (quick tactics) are my strong suit.")
         try:
             # Using the hypothesis chart that shows game moves vs outcome
-            img_moves = Image.open('images/viz_hypothesis_2.png')
-            st.image(img_moves, caption='Game Length impact on Results', use_container_width=True)
+            st.image('images/viz_hypothesis_2.png', caption='Game Length impact on Results', use_container_width=True)
         except:
             st.error("Missing Game Length chart")
 
     # 5. Raw Data (Credibility)
     with st.expander("👀 Peek at the Raw Data"):
         st.write("Here is a sample of the actual game logs I analyzed:")
-        st.dataframe(df.head())
+        st.dataframe(load_data_sample())
 
 
 # --- PAGE 2: WIN PREDICTOR ---
@@ -119,34 +171,20 @@ elif page == "Win Predictor":
     **Adjust the sliders sidebar to see if I win this position!**
     """)
 
-    model, model_columns = load_resources()
+    model, model_columns, openings, col_idx = load_resources()
 
     # --- SIDEBAR INPUTS ---
     st.sidebar.header("Game State Inputs")
     
     material = st.sidebar.number_input("Material Difference", min_value=-10, max_value=10, value=0, help="Positive = I have more material")
-    mobility = st.sidebar.slider("Mobility Score", 0, 60, 30, help="Number of legal moves available")
+    mobility = st.sidebar.slider("Mobility Score", 0, 60, 30, help="Number of moves available (pseudo-legal)")
     color_input = st.sidebar.radio("My Color", ["White", "Black"])
     king_moved = st.sidebar.checkbox("Has King Moved?", value=False, help="Check if the King has moved")
     
-    openings = [c.replace('open_', '') for c in model_columns if c.startswith('open_')]
-    opening_choice = st.sidebar.selectbox("Opening", ['Other'] + openings)
+    opening_choice = st.sidebar.selectbox("Opening", ('Other',) + openings)
 
     # --- PREDICTION LOGIC ---
-    input_data = pd.DataFrame(columns=model_columns)
-    input_data.loc[0] = 0 # Fill with zeros
-
-    input_data['material_diff'] = material
-    input_data['mobility_count'] = mobility
-    input_data['king_moved'] = 1 if king_moved else 0
-    input_data['is_white'] = 1 if color_input == "White" else 0
-    
-    if opening_choice != 'Other':
-        col_name = f"open_{opening_choice}"
-        if col_name in input_data.columns:
-            input_data[col_name] = 1
-
-    prob = model.predict_proba(input_data)[0][1] # Probability of Class 1 (Win)
+    prob = predict_win_probability(material, mobility, king_moved, color_input == "White", opening_choice)
     
     # --- DISPLAY RESULTS ---
     col_main, col_viz = st.columns([1, 2])
@@ -171,8 +209,7 @@ elif page == "Win Predictor":
         st.subheader("Why this prediction?")
         st.write("Here are the features that matter most to the model:")
         try:
-            img_coeff = Image.open('images/ml_1_coefficients.png')
-            st.image(img_coeff, use_container_width=True)
+            st.image('images/ml_1_coefficients.png', use_container_width=True)
         except:
             st.write("Feature chart missing")
 
@@ -16,21 +16,27 @@ WHAT IT DOES:
 3. For each game, it carefully pulls apart the raw data (called PGN) to
    extract the important details we care about, like who won, what the
    ratings were, the opening played, etc.
-4. Finally, it organizes all this information neatly into a single CSV file,
-   which will be the foundation for all our future analysis in the project.
+4. Finally, it organizes all this information neatly into a single Parquet
+   file, which will be the foundation for all our future analysis in the
+   project. Parquet is compressed and keeps our column types, so the long PGN
+   text loads much faster than from a CSV.
 
 This script only needs to be run once to get the data.
 """
 
 # We'll need these libraries to make our script work.
 import requests  # The standard for making web requests in Python.
+from requests.adapters import HTTPAdapter  # Lets us plug retry rules into requests.
+from urllib3.util.retry import Retry  # Retries with backoff when the API is busy.
 import pandas as pd  # The best library for working with data tables.
 import chess.pgn # The library that understands the language of chess games (PGN).
 import io  # A tool to treat a string of text like it's a file.
+import re  # To pick the moves out of the PGN text without a full parse.
 import os  # Helps us work with file paths and directories.
+import json  # To save downloaded archives to disk and read them back.
+from concurrent.futures import ThreadPoolExecutor, as_completed  # To download several archives at once.
 from tqdm import tqdm  # For creating those satisfying progress bars.
-import time # To let us pause the script for a moment.
-from datetime import datetime # Needed to correctly handle date and time information.
+from datetime import datetime, timezone # Needed to correctly handle date and time information.
 
 
 # --- Configuration ---
@@ -38,7 +44,26 @@ from datetime import datetime # Needed to correctly handle date and time informa
 # This is the only part of the script you should need to change.
 USERNAME = "currystan" # Your chess.com username
 OUTPUT_DIR = "data"
-OUTPUT_FILE = os.path.join(OUTPUT_DIR, "chess_games_raw.csv")
+OUTPUT_FILE = os.path.join(OUTPUT_DIR, "chess_games_raw.parquet")
+# Finished months never change, so we keep a copy of each downloaded archive
+# here and only go back to chess.com for the current month.
+ARCHIVE_CACHE_DIR = os.path.join(OUTPUT_DIR, ".archive_cache")
+# How many archives we download at the same time. Kept small to stay polite.
+MAX_WORKERS = 8
+
+
+# --- HTTP Session ---
+# We reuse one session for every request so the connection to chess.com is
+# kept alive instead of doing a new handshake for each archive.
+# BEST PRACTICE: We add a User-Agent header to identify our script.
+# Many APIs, including chess.com's, will block requests without one
+# to prevent anonymous bots from spamming their service.
+session = requests.Session()
+session.headers.update({"User-Agent": "My Chess Analysis Project"})
+# If chess.com tells us to slow down (429) or has a hiccup (5xx), we wait and
+# try again, respecting its Retry-After header.
+retries = Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+session.mount("https://", HTTPAdapter(max_retries=retries))
 
 
 def get_archive_urls(username):
@@ -48,17 +73,10 @@ def get_archive_urls(username):
     """
     print(f"Finding game archives for user: {username}...")
     url = f"https://api.chess.com/pub/player/{username}/games/archives"
-    
-    # BEST PRACTICE: We add a User-Agent header to identify our script.
-    # Many APIs, including chess.com's, will block requests without one
-    # to prevent anonymous bots from spamming their service.
-    headers = {
-        "User-Agent": f"My Chess Analysis Project"
-    }
 
     try:
-        # We pass our custom headers with the request.
-        response = requests.get(url, headers=headers)
+        # The session already carries our custom headers.
+        response = session.get(url)
         response.raise_for_status()
         return response.json().get("archives", [])
     except requests.exceptions.RequestException as e:
@@ -66,20 +84,88 @@ def get_archive_urls(username):
         return []
 
 
+def fetch_archive(url, current_month):
+    """
+    Downloads one monthly archive and returns its JSON. Finished months are
+    read from our disk cache; the current month is always fetched again
+    because it is still growing.
+    """
+    # e.g. ".../games/2025/06" is cached as "2025-06.json"
+    month = url.rsplit("/games/", 1)[1]
+    cache_path = os.path.join(ARCHIVE_CACHE_DIR, month.replace("/", "-") + ".json")
+    month_finished = month != current_month
+
+    if month_finished and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # A broken or unreadable cache file is just a cache miss.
+            pass
+
+    response = session.get(url)
+    response.raise_for_status()
+    archive = response.json()
+
+    # Only finished months are cached. If we cached the current month, it
+    # would be served half-empty from disk once the month is over.
+    if month_finished:
+        # Write to a temporary file first and then swap it in, so an
+        # interrupted run can never leave a half-written cache file behind.
+        tmp_path = cache_path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(archive, f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            # We already have the games; a failed write (disk full, no
+            # permission...) just means this month is downloaded again next time.
+            print(f"\nWarning: Could not cache {url}. Error: {e}.")
+    return archive
+
+
+# Pieces of PGN movetext that are not moves: {comments} (chess.com puts the
+# clock times there), ;line comments, (variations), $1-style annotation
+# glyphs, move numbers like "12." or "12...", and the result.
+COMMENT_RE = re.compile(r"\{[^}]*\}|;[^\n]*")
+VARIATION_RE = re.compile(r"\([^()]*\)")
+NAG_RE = re.compile(r"\$\d+")
+MOVE_NUMBER_RE = re.compile(r"\d+\.(?:\.\.)?")
+RESULTS = {"1-0", "0-1", "1/2-1/2", "*"}
+
+
+def count_plies(game_pgn):
+    """
+    Counts the half-moves in a PGN by looking at the move text directly,
+    which is much cheaper than building the whole game with python-chess.
+    """
+    movetext = "\n".join(line for line in game_pgn.splitlines() if not line.startswith("["))
+    movetext = COMMENT_RE.sub(" ", movetext)
+    # Variations can be nested, so peel them off from the innermost out
+    while True:
+        movetext, removed = VARIATION_RE.subn(" ", movetext)
+        if not removed:
+            break
+    movetext = NAG_RE.sub(" ", movetext)
+    movetext = MOVE_NUMBER_RE.sub(" ", movetext)
+    return sum(1 for token in movetext.split() if token not in RESULTS)
+
+
 def process_game(game_pgn, username):
     """
     This is the core function where we dissect each individual game.
     We take the raw PGN text and pull out all the details we care about.
     """
     try:
+        # We only need the tags (players, ratings, result...), so we read just
+        # the headers instead of parsing every move into a game tree.
         pgn_io = io.StringIO(game_pgn)
-        game = chess.pgn.read_game(pgn_io)
+        headers = chess.pgn.read_headers(pgn_io)
 
-        if game is None:
+        if headers is None:
             return None
 
         game_data = {}
-        headers = game.headers
 
         # The API gives us date and time as separate text fields. We need to
         # combine them to create a proper, sortable timestamp.
@@ -127,7 +213,11 @@ def process_game(game_pgn, username):
         game_data["time_class"] = headers.get("TimeClass")
         opening_url = headers.get("ECOUrl", "")
         game_data["opening"] = opening_url.split("/")[-1].replace("-", " ")
-        game_data["number_of_moves"] = game.end().board().fullmove_number
+        # The move number of the final position: use the PlyCount tag if the
+        # PGN has one, otherwise count the half-moves ourselves.
+        ply_count = headers.get("PlyCount")
+        ply_count = int(ply_count) if ply_count else count_plies(game_pgn)
+        game_data["number_of_moves"] = ply_count // 2 + 1
         game_data["pgn"] = game_pgn
 
         return game_data
@@ -149,19 +239,26 @@ def main():
         print("Couldn't find any game archives. Is the username correct? Exiting.")
         return
 
-    # We also need our header for the requests inside the loop.
-    headers = {
-        "User-Agent": f"My Chess Analysis Project"
-    }
-    
     all_games = []
     print(f"Found {len(archive_urls)} monthly archives. This might take a few minutes...")
 
-    for url in tqdm(archive_urls, desc="Fetching Archives"):
-        try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            games_in_month = response.json().get("games", [])
+    # The archive for the current month is still growing, so it is the only
+    # one we always download again.
+    current_month = datetime.now(timezone.utc).strftime("%Y/%m")
+    os.makedirs(ARCHIVE_CACHE_DIR, exist_ok=True)
+
+    # Downloading is just waiting on the network, so we fetch several months
+    # in parallel threads. Parsing the games stays here in the main thread.
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = {pool.submit(fetch_archive, url, current_month): url for url in archive_urls}
+
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Fetching Archives"):
+            url = futures[future]
+            try:
+                games_in_month = future.result().get("games", [])
+            except requests.exceptions.RequestException as e:
+                print(f"\nWarning: Could not fetch data from {url}. Error: {e}. Skipping this month.")
+                continue
 
             for game_info in games_in_month:
                 pgn = game_info.get("pgn")
@@ -169,11 +266,6 @@ def main():
                     game_details = process_game(pgn, USERNAME)
                     if game_details:
                         all_games.append(game_details)
-            
-            time.sleep(1)
-
-        except requests.exceptions.RequestException as e:
-            print(f"\nWarning: Could not fetch data from {url}. Error: {e}. Skipping this month.")
 
     print("\n--- Data collection complete! ---")
 
@@ -182,11 +274,12 @@ def main():
         return
 
     print(f"Successfully processed {len(all_games)} games.")
-    print("Creating a DataFrame and saving it to a CSV file...")
-    df = pd.DataFrame(all_games)
+    print("Creating a DataFrame and saving it to a Parquet file...")
+    # Archives finish in any order, so we put the games back in chronological order.
+    df = pd.DataFrame(all_games).sort_values("timestamp", kind="stable").reset_index(drop=True)
 
     os.makedirs(OUTPUT_DIR, exist_ok=True)
-    df.to_csv(OUTPUT_FILE, index=False)
+    df.to_parquet(OUTPUT_FILE, compression="zstd", index=False)
     print(f"--- All done! Your data has been saved to '{OUTPUT_FILE}' ---")
 
 
@@ -20,7 +20,9 @@ KEY DECISIONS I MADE:
     usually ends here, and the middle-game strategy begins.
 3.  **Turn Fairness:** To calculate "Mobility" (how many moves I have), I ensure
     the board snapshot is always taken when it is *MY* turn. If the simulation
-    stops on the opponent's turn, I undo the last move.
+    stops on the opponent's turn, I undo the last move. Mobility counts
+    pseudo-legal moves (it skips the "does this leave my king in check?"
+    test), which is much cheaper and just as useful as a rough activity score.
 4.  **Handling Correlations:** Instead of feeding the model "My Rating" and
     "Opponent Rating" (which correlate), I calculate "Rating Difference."
 5.  **Opening Encoding:** To prevent "The Curse of Dimensionality" (too many
@@ -31,20 +33,55 @@ KEY DECISIONS I MADE:
 
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import chess.pgn
 import io
+import os
+import hashlib
+import pickle
 import warnings
+from itertools import islice
+from joblib import Parallel, delayed
 from datetime import datetime
 
 # Suppress minor warnings for cleaner output
 warnings.filterwarnings('ignore')
 
 # --- CONFIGURATION ---
-INPUT_FILE = "data/chess_games_raw.csv"
+INPUT_FILE = "data/chess_games_raw.parquet"
+# Older runs of the collection script saved the raw games as CSV
+LEGACY_INPUT_FILE = "data/chess_games_raw.csv"
 OUTPUT_FILE = "data/chess_ml_ready.csv"
 MY_USERNAME = "currystan"
 MOVE_CUTOFF = 15
 SUMMER_START_DATE = pd.Timestamp('2025-06-01')
+FEATURE_COLUMNS = ['material_diff', 'mobility_count', 'king_moved', 'is_white']
+# Features of games I already simulated, so re-runs only simulate new games.
+FEATURE_CACHE_FILE = "data/.feat_cache.pkl"
+# Bump this whenever get_board_state_features changes, so cached features
+# from the old logic are never mixed with new ones.
+FEATURE_VERSION = 2
+
+def get_cache_key(pgn_text):
+    """
+    A short fingerprint of a game (plus the settings and feature version
+    that change its features), used to look it up in the feature cache.
+    """
+    text = f"{FEATURE_VERSION}|{MY_USERNAME}|{MOVE_CUTOFF}|{pgn_text}"
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+def load_feature_cache():
+    try:
+        with open(FEATURE_CACHE_FILE, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        # Missing, truncated or incompatible cache: start from scratch
+        return {}
+
+def save_feature_cache(cache):
+    with open(FEATURE_CACHE_FILE, 'wb') as f:
+        pickle.dump(cache, f)
 
 def get_board_state_features(pgn_text):
     """
@@ -67,7 +104,9 @@ def get_board_state_features(pgn_text):
         board = game.board()
         
         # 2. Replay the game up to Move 15
-        for i, move in enumerate(game.mainline_moves()):
+        # The fullmove check below is what stops the replay (mainline_moves is
+        # lazy); islice is only a defensive upper bound on the plies we read.
+        for move in islice(game.mainline_moves(), MOVE_CUTOFF * 2 + 1):
             board.push(move)
             # Stop if we hit the move count
             if board.fullmove_number > MOVE_CUTOFF:
@@ -75,6 +114,7 @@ def get_board_state_features(pgn_text):
                 
         # CRITICAL CHECK: If the game ended early (e.g., fast checkmate),
         # we can't use it for prediction as it's an outlier.
+        # (process_data already drops these by move count; this is a safety net.)
         if board.fullmove_number < MOVE_CUTOFF:
             return None
 
@@ -101,20 +141,21 @@ def get_board_state_features(pgn_text):
         }
 
         # Calculate Material (Total army value)
+        # Instead of visiting all 64 squares, I count pieces straight off the
+        # bitboards: one popcount per piece type and color.
         my_material = 0
         opp_material = 0
-        
-        for square in chess.SQUARES:
-            piece = board.piece_at(square)
-            if piece:
-                value = piece_values.get(piece.piece_type, 0)
-                if piece.color == my_color:
-                    my_material += value
-                else:
-                    opp_material += value
-
-        # Calculate Mobility (My available legal moves)
-        mobility_count = board.legal_moves.count()
+
+        for piece_type, value in piece_values.items():
+            my_material += value * chess.popcount(board.pieces_mask(piece_type, my_color))
+            opp_material += value * chess.popcount(board.pieces_mask(piece_type, not my_color))
+
+        # Calculate Mobility (My available moves)
+        # I count pseudo-legal moves: they skip the king-in-check validation
+        # that makes full legal move generation the slowest step here. It only
+        # differs from the legal count when pins or checks are involved, which
+        # is fine for a rough activity score. (Retrain the model after changing this.)
+        mobility_count = sum(1 for _ in board.generate_pseudo_legal_moves())
         
         # King Safety (Has my king moved from its starting square?)
         my_king_sq = board.king(my_color)
@@ -136,9 +177,20 @@ def process_data():
     print("--- STARTING PHASE 4: FEATURE ENGINEERING ---")
     
     # 1. Load Data
-    print(f"Loading raw data from {INPUT_FILE}...")
+    input_file = INPUT_FILE if os.path.exists(INPUT_FILE) else LEGACY_INPUT_FILE
+    print(f"Loading raw data from {input_file}...")
     try:
-        df = pd.read_csv(INPUT_FILE)
+        if input_file.endswith('.parquet'):
+            df = pd.read_parquet(input_file)
+        else:
+            # PyArrow's C++ CSV reader is much faster than pandas on the long
+            # PGN strings (which contain newlines, hence newlines_in_values).
+            # Keep time_control as text, exactly like the Parquet file stores it
+            df = pacsv.read_csv(
+                input_file,
+                parse_options=pacsv.ParseOptions(newlines_in_values=True),
+                convert_options=pacsv.ConvertOptions(column_types={'time_control': pa.string()}),
+            ).to_pandas()
     except FileNotFoundError:
         print(f"Error: {INPUT_FILE} not found. Please run the collection script first.")
         return
@@ -148,33 +200,55 @@ def process_data():
     # 2. Apply Scope Filters (Matching my EDA)
     print("Applying filters (Summer 2025, Rapid 10min, No Draws)...")
     
-    # Convert timestamp for filtering
-    df['date'] = pd.to_datetime(df['timestamp'], unit='s')
+    # I run the cheapest filters first so every later step touches fewer rows.
     
-    # Filter: Only Summer 2025
-    df = df[df['date'] >= SUMMER_START_DATE].copy()
+    # Filter: Remove Draws (Binary Classification is cleaner)
+    df = df[df['outcome'] != 'draw']
     
     # Filter: Only 10 Minute Rapid games (Time Control '600')
-    df = df[df['time_control'].astype(str) == '600'].copy()
+    df = df[df['time_control'] == '600']
     
-    # Filter: Remove Draws (Binary Classification is cleaner)
-    df = df[df['outcome'] != 'draw'].copy()
+    # Filter: Only Summer 2025
+    # (Only the remaining timestamps need converting to dates)
+    dates = pd.to_datetime(df['timestamp'], unit='s')
+    df = df[dates >= SUMMER_START_DATE].reset_index(drop=True)
     
     print(f"Data reduced from {raw_count} to {len(df)} games for analysis.")
 
+    # Games that ended before Move 15 can never give a snapshot, and the
+    # collection script already recorded how long each game was. Dropping them
+    # here saves parsing their PGN just to throw the result away.
+    df = df[df['number_of_moves'] >= MOVE_CUTOFF].reset_index(drop=True)
+
     # 3. Apply Chess Logic
-    # This runs the board simulation on every game.
-    print(f"Simulating games to Move {MOVE_CUTOFF}...")
-    features = df['pgn'].apply(get_board_state_features)
+    # This runs the board simulation on every game. Every game is independent
+    # and the replay is pure Python, so I spread the games over all CPU cores
+    # (processes, not threads, because of the GIL).
+    # Games I simulated on a previous run come straight from the cache.
+    pgns = df['pgn'].tolist()
+    keys = [get_cache_key(pgn) for pgn in pgns]
+    cache = load_feature_cache()
+    missing = [i for i, key in enumerate(keys) if key not in cache]
     
-    # Convert the list of results into a DataFrame
-    features_df = pd.json_normalize(features)
+    print(f"Simulating games to Move {MOVE_CUTOFF} ({len(pgns) - len(missing)} already cached, {len(missing)} new)...")
+    new_features = Parallel(n_jobs=-1, prefer='processes', batch_size=64)(
+        delayed(get_board_state_features)(pgns[i]) for i in missing
+    )
     
-    # Combine original metadata with new chess features
-    df_ml = pd.concat([df.reset_index(drop=True), features_df.reset_index(drop=True)], axis=1)
+    # Failed games (None) are cached too, so they aren't retried every run
+    if missing:
+        for i, result in zip(missing, new_features):
+            cache[keys[i]] = result
+        save_feature_cache(cache)
+    features = [cache[key] for key in keys]
+    
+    # Keep the positions of games where feature extraction worked (failures
+    # are short games) and turn those flat records straight into a DataFrame
+    idx = [i for i, f in enumerate(features) if f is not None]
+    features_df = pd.DataFrame.from_records([features[i] for i in idx], columns=FEATURE_COLUMNS)
     
-    # Drop rows where feature extraction failed (short games)
-    df_ml = df_ml.dropna(subset=['material_diff'])
+    # Combine original metadata with new chess features
+    df_ml = pd.concat([df.iloc[idx].reset_index(drop=True), features_df], axis=1)
 
     # 4. Create Rating Features
     # I calculate the difference because raw ratings correlate too heavily.
@@ -183,27 +257,40 @@ def process_data():
     # 5. Encode Categorical Data (Openings)
     # I use a "Top N" strategy: Keep the 7 most common openings, map the rest to "Other".
     top_openings = df_ml['opening'].value_counts().head(7).index
-    df_ml['opening_simplified'] = df_ml['opening'].apply(lambda x: x if x in top_openings else 'Other')
+    is_top_opening = df_ml['opening'].isin(top_openings)
+    df_ml['opening_simplified'] = df_ml['opening'].where(is_top_opening, 'Other')
     
     # One-Hot Encoding
     # I use drop_first=True to avoid multicollinearity (crucial for Logistic Regression)
-    dummy_openings = pd.get_dummies(df_ml['opening_simplified'], prefix='open', drop_first=True)
+    # The dummies are just 0/1, so a single byte per cell is plenty.
+    dummy_openings = pd.get_dummies(df_ml['opening_simplified'], prefix='open', drop_first=True, dtype=np.uint8)
     
-    # 6. Final Assembly
-    df_ml = pd.concat([df_ml, dummy_openings], axis=1)
-    
-    # Map Target: Win = 1, Loss = 0
-    df_ml['target'] = df_ml['outcome'].apply(lambda x: 1 if x == 'win' else 0)
+    # 6. Map Target: Win = 1, Loss = 0
+    df_ml['target'] = (df_ml['outcome'].to_numpy() == 'win').astype(np.uint8)
 
-    # 7. Select Final Columns
+    # 7. Final Assembly
     # I keep 'rating_diff' for now, but I might drop it during training to test
     # the "pure" board state predictive power.
-    keep_cols = ['target', 'is_white', 'material_diff', 'rating_diff', 'mobility_count', 'king_moved'] + list(dummy_openings.columns)
+    # Instead of gluing the dummies onto the full df_ml and then selecting, I
+    # join them straight onto the columns I keep (one copy instead of two).
+    keep_cols = ['target', 'is_white', 'material_diff', 'rating_diff', 'mobility_count', 'king_moved']
+    
+    final_dataset = pd.concat([df_ml[keep_cols].reset_index(drop=True), dummy_openings.reset_index(drop=True)], axis=1)
     
-    final_dataset = df_ml[keep_cols]
+    # Downcast to the smallest types that fit: the flags are 0/1, material
+    # is within +-39, mobility stays well under 255 and rating gaps are small.
+    narrow_types = {c: np.uint8 for c in ['target', 'is_white', 'king_moved'] + list(dummy_openings.columns)}
+    narrow_types.update({'material_diff': np.int8, 'mobility_count': np.uint8, 'rating_diff': np.int16})
+    final_dataset = final_dataset.astype(narrow_types)
     
     # 8. Save
-    final_dataset.to_csv(OUTPUT_FILE, index=False)
+    # PyArrow's C++ CSV writer is much faster than pandas' to_csv.
+    # No column name contains a comma, so I write the header unquoted like before.
+    pacsv.write_csv(
+        pa.Table.from_pandas(final_dataset, preserve_index=False),
+        OUTPUT_FILE,
+        write_options=pacsv.WriteOptions(quoting_header='none'),
+    )
     print(f"SUCCESS: Machine Learning dataset saved to {OUTPUT_FILE} ({len(final_dataset)} rows)")
     print("Features ready for training:")
     print(final_dataset.columns.tolist())
@@ -0,0 +1,57 @@
+"""
+================================================================================
+SCRIPT 03: RESIZE CHART IMAGES FOR THE APP
+================================================================================
+
+WHY I NEED THIS SCRIPT:
+-----------------------
+The Streamlit app shows a lot of the charts I saved from the notebook. Some of
+them are exported at dpi=300 and are much wider than the app can ever display.
+Streamlit sends PNGs that fit its maximum content width as they are, but it
+shrinks (and re-encodes) anything wider on *every* rerun of the page.
+
+WHAT IT DOES:
+-------------
+1. It finds every PNG in the images folder.
+2. Any chart wider than Streamlit's maximum content width is scaled down once,
+   here, and saved back as a PNG, so the app can send it straight through.
+
+Run it again whenever I re-export a chart from the notebook.
+"""
+
+from pathlib import Path
+from PIL import Image
+
+# --- CONFIGURATION ---
+IMAGES_DIR = Path("images")
+# Streamlit's MAXIMUM_CONTENT_WIDTH (2 x 730 px): wider images get resized by
+# the server every time they are shown.
+MAX_WIDTH = 1460
+
+
+def resize_images():
+    print(f"--- Resizing PNG charts in '{IMAGES_DIR}' to at most {MAX_WIDTH}px wide ---")
+    png_files = sorted(IMAGES_DIR.glob("*.png"))
+
+    if not png_files:
+        print("No PNG images found. Did you export the charts from the notebook?")
+        return
+
+    resized = 0
+    for png_path in png_files:
+        with Image.open(png_path) as image:
+            width, height = image.size
+            if width <= MAX_WIDTH:
+                continue
+            new_size = (MAX_WIDTH, round(height * MAX_WIDTH / width))
+            small = image.resize(new_size, resample=Image.LANCZOS)
+
+        small.save(png_path, "PNG", optimize=True)
+        resized += 1
+        print(f"{png_path.name}: {width}x{height} -> {new_size[0]}x{new_size[1]}")
+
+    print(f"--- Done! Resized {resized} of {len(png_files)} images. ---")
+
+
+if __name__ == "__main__":
+    resize_images()